@@ -591,6 +591,22 @@ class TestTranscript(unittest.TestCase):
         with self.assertRaises(transcripts_utils.TranscriptsGenerationException):
             transcripts_utils.Transcript.convert(invalid_srt_transcript, 'srt', 'sjson')
 
+    def test_convert_srt_bytes_to_sjson(self):
+        """
+        Tests that an srt transcript given as bytes is successfully converted into sjson format.
+        """
+        expected = self.sjson_transcript
+        actual = transcripts_utils.Transcript.convert(self.srt_transcript.encode('utf-8'), 'srt', 'sjson')
+        self.assertDictEqual(json.loads(actual), json.loads(expected))
+
+    def test_convert_invalid_srt_bytes_to_sjson(self):
+        """
+        Tests that TranscriptsGenerationException was raises on trying
+        to convert invalid srt transcript bytes to sjson.
+        """
+        with self.assertRaises(transcripts_utils.TranscriptsGenerationException):
+            transcripts_utils.Transcript.convert(b'invalid SubRip file content', 'srt', 'sjson')
+
     def test_convert_invalid_invalid_sjson_to_srt(self):
         invalid_content = "Text with special character /\"\'\b\f\t\r\n."
         error_transcript = {"start": [1], "end": [2], "text": ["An error occured obtaining the transcript."]}
@@ -16,6 +16,7 @@ from django.urls import reverse
 from edxval.api import create_video
 from opaque_keys.edx.keys import UsageKey
 from organizations.tests.factories import OrganizationFactory
+from webob import Request
 
 from cms.djangoapps.contentstore.tests.utils import CourseTestCase, setup_caption_responses
 from openedx.core.djangoapps.contentserver.caching import del_cached_content
@@ -1173,3 +1174,42 @@ class TestCheckTranscripts(BaseTranscripts):
                 'html5_equal': False,
             }
         )
+
+
+class TestLibraryVideoStudioTranscript(BaseTranscripts):
+    """
+    Tests for uploading and deleting the transcripts of a library video through its `studio_transcript` handler.
+    """
+
+    def load_library_block(self):
+        """
+        Load the library video block afresh from Learning Core.
+        """
+        return xblock_api.load_block(self.library_block_metadata.usage_key, self.user)
+
+    def test_upload_and_delete_library_transcript(self):
+        """
+        Verify that the `transcripts` field of a library video is persisted on save after an upload and a delete.
+        """
+        request = Request.blank('/translation', POST={
+            'edx_video_id': '',
+            'language_code': 'uk',
+            'new_language_code': 'uk',
+            'file': ('filename.srt', SRT_TRANSCRIPT_CONTENT),
+        })
+        response = self.library_block.studio_transcript(request=request, dispatch='translation')
+        self.assertEqual(response.status_code, 201)
+        self.library_block.save()
+
+        library_block = self.load_library_block()
+        self.assertEqual(library_block.transcripts, {'uk': 'static/transcript-uk.srt'})
+
+        request = Request(
+            {'wsgi.url_scheme': 'http', 'REQUEST_METHOD': 'DELETE'},
+            body=json.dumps({'lang': 'uk', 'edx_video_id': ''}).encode('utf-8'),
+        )
+        response = library_block.studio_transcript(request=request, dispatch='translation')
+        self.assertEqual(response.status_code, 200)
+        library_block.save()
+
+        self.assertEqual(self.load_library_block().transcripts, {})
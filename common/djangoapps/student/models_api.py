@@ -54,6 +54,16 @@ def get_course_enrollment(user, course_run_key):
     return _CourseEnrollment.get_enrollment(user, course_run_key)
 
 
+def get_course_enrollments_for_users(user_ids, course_run_key):
+    """
+    Return the enrollments of the given users in a course run, with the related users fetched in the same query.
+    """
+    return _CourseEnrollment.objects.filter(
+        user_id__in=user_ids,
+        course_id=course_run_key,
+    ).select_related('user')
+
+
 def get_phone_number(user_id):
     """
     Get a user's phone number from the profile, if
@@ -2,19 +2,38 @@
 Python APIs exposed for the progress tracking functionality of the course home API.
 """
 
+from completion.models import BlockCompletion
 from django.contrib.auth import get_user_model
+from django.db.models import Count, Q
 from opaque_keys.edx.keys import CourseKey
 
+from lms.djangoapps.course_home_api.toggles import course_progress_analytics_from_completions_is_enabled
 from lms.djangoapps.courseware.courses import get_course_blocks_completion_summary
+from openedx.core.djangoapps.content.block_structure.block_structure import BlockStructureBlockData
 
 User = get_user_model()
 
 
-def calculate_progress_for_learner_in_course(course_key: CourseKey, user: User) -> dict:
+def calculate_progress_for_learner_in_course(
+    course_key: CourseKey,
+    user: User,
+    collected_block_structure: BlockStructureBlockData | None = None,
+    from_completions: bool | None = None,
+) -> dict:
     """
     Calculate a given learner's progress in the specified course run.
+
+    The `collected_block_structure` can be provided to avoid re-collecting the course structure when calculating
+    progress for many learners in the same course run. Likewise, `from_completions` can be provided to avoid checking
+    the `course_progress_analytics_from_completions` flag for every learner; it defaults to the flag's value.
     """
-    summary = get_course_blocks_completion_summary(course_key, user)
+    if from_completions is None:
+        from_completions = course_progress_analytics_from_completions_is_enabled(course_key)
+
+    if from_completions:
+        summary = get_block_completion_counts(course_key, user)
+    else:
+        summary = get_course_blocks_completion_summary(course_key, user, collected_block_structure)
     if not summary:
         return {}
 
@@ -43,3 +62,22 @@ def calculate_progress_for_learner_in_course(course_key: CourseKey, user: User)
         "locked_percentage": locked_percentage,
         "incomplete_percentage": incomplete_percentage
     }
+
+
+def get_block_completion_counts(course_key: CourseKey, user: User) -> dict:
+    """
+    Count a learner's complete and incomplete blocks in the specified course run with a single aggregate query.
+
+    Unlike `get_course_blocks_completion_summary`, this doesn't walk the course block tree: the counts are per
+    component rather than per unit, only include the blocks the learner has a completion record for, and locked
+    content is not detected.
+    """
+    counts = BlockCompletion.objects.filter(user=user, context_key=course_key).aggregate(
+        complete_count=Count("pk", filter=Q(completion__gte=1.0)),
+        total_count=Count("pk"),
+    )
+    return {
+        "complete_count": counts["complete_count"],
+        "incomplete_count": counts["total_count"] - counts["complete_count"],
+        "locked_count": 0,
+    }
@@ -4,9 +4,19 @@ Tests for the Python APIs exposed by the Progress API of the Course Home API app
 
 from unittest.mock import patch
 
+from completion.models import BlockCompletion
 from django.test import TestCase
+from edx_toggles.toggles.testutils import override_waffle_flag
+from opaque_keys.edx.keys import CourseKey
 
-from lms.djangoapps.course_home_api.progress.api import calculate_progress_for_learner_in_course
+from common.djangoapps.student.tests.factories import UserFactory
+from lms.djangoapps.course_home_api.progress.api import (
+    calculate_progress_for_learner_in_course,
+    get_block_completion_counts,
+)
+from lms.djangoapps.course_home_api.toggles import COURSE_HOME_COURSE_PROGRESS_ANALYTICS_FROM_COMPLETIONS
+
+COURSE_KEY = CourseKey.from_string("course-v1:edX+DemoX+Demo_Course")
 
 
 class ProgressApiTests(TestCase):
@@ -35,8 +45,8 @@ class ProgressApiTests(TestCase):
             "incomplete_percentage": 0.26,
         }
 
-        results = calculate_progress_for_learner_in_course("some_course", "some_user")
-        assert mock_get_summary.called_once_with("some_course", "some_user")
+        results = calculate_progress_for_learner_in_course(COURSE_KEY, "some_user")
+        mock_get_summary.assert_called_once_with(COURSE_KEY, "some_user", None)
         assert results == expected_data
 
     @patch("lms.djangoapps.course_home_api.progress.api.get_course_blocks_completion_summary")
@@ -60,8 +70,8 @@ class ProgressApiTests(TestCase):
             "incomplete_percentage": 0.0,
         }
 
-        results = calculate_progress_for_learner_in_course("some_course", "some_user")
-        assert mock_get_summary.called_once_with("some_course", "some_user")
+        results = calculate_progress_for_learner_in_course(COURSE_KEY, "some_user")
+        mock_get_summary.assert_called_once_with(COURSE_KEY, "some_user", None)
         assert results == expected_data
 
     @patch("lms.djangoapps.course_home_api.progress.api.get_course_blocks_completion_summary")
@@ -71,5 +81,41 @@ class ProgressApiTests(TestCase):
         """
         mock_get_summary.return_value = {}
 
-        results = calculate_progress_for_learner_in_course("some_course", "some_user")
+        results = calculate_progress_for_learner_in_course(COURSE_KEY, "some_user")
         assert not results
+
+    @override_waffle_flag(COURSE_HOME_COURSE_PROGRESS_ANALYTICS_FROM_COMPLETIONS, active=True)
+    @patch("lms.djangoapps.course_home_api.progress.api.get_course_blocks_completion_summary")
+    def test_calculate_progress_for_learner_in_course_from_completions(self, mock_get_summary):
+        """
+        A test to verify the progress is calculated from the learner's completions when the flag is enabled.
+        """
+        user = UserFactory()
+        for block_id, completion in (("one", 1.0), ("two", 1.0), ("three", 0.5)):
+            BlockCompletion.objects.create(
+                user=user,
+                context_key=COURSE_KEY,
+                block_type="problem",
+                block_key=COURSE_KEY.make_usage_key("problem", block_id),
+                completion=completion,
+            )
+        # completions in other courses don't count towards this one
+        other_course_key = CourseKey.from_string("course-v1:edX+Other+Course")
+        BlockCompletion.objects.create(
+            user=user,
+            context_key=other_course_key,
+            block_type="problem",
+            block_key=other_course_key.make_usage_key("problem", "one"),
+            completion=1.0,
+        )
+
+        assert get_block_completion_counts(COURSE_KEY, user) == {
+            "complete_count": 2,
+            "incomplete_count": 1,
+            "locked_count": 0,
+        }
+
+        results = calculate_progress_for_learner_in_course(COURSE_KEY, user)
+        mock_get_summary.assert_not_called()
+        assert results["total_count"] == 3
+        assert results["complete_percentage"] == 0.67
@@ -2,61 +2,228 @@
 Celery tasks used by the `course_home_api` app.
 """
 import logging
+from functools import lru_cache
 
-from celery import shared_task
-from django.contrib.auth import get_user_model
+from celery import group, shared_task
+from django.core.cache import cache
 from edx_django_utils.monitoring import set_code_owner_attribute
 from eventtracking import tracker
 from opaque_keys import InvalidKeyError
 from opaque_keys.edx.keys import CourseKey
 
-from common.djangoapps.student.models_api import get_course_enrollment
+from common.djangoapps.student.models import CourseEnrollment
+from common.djangoapps.student.models_api import get_course_enrollments_for_users
 from lms.djangoapps.course_home_api.progress.api import calculate_progress_for_learner_in_course
+from lms.djangoapps.course_home_api.toggles import course_progress_analytics_from_completions_is_enabled
+from openedx.core.djangoapps.content.block_structure.api import get_block_structure_manager
+from openedx.core.djangoapps.content.block_structure.block_structure import BlockStructureBlockData
 
-User = get_user_model()
 COURSE_COMPLETION_FOR_USER_EVENT_NAME = "edx.bi.user.course-progress"
+# extra fields added to the progress data to make the event payload a bit more usable
+_PROGRESS_EVENT_FIELDS = ("user_id", "course_id", "enrollment_mode", "calculation_method")
+# Values of the event's `calculation_method` field. The counts of the two methods don't mean the same thing: the block
+# structure counts units and locked content, the completions aggregate counts components and never reports locked ones.
+PROGRESS_CALCULATION_METHOD_BLOCK_STRUCTURE = "block_structure"
+PROGRESS_CALCULATION_METHOD_COMPLETIONS = "completions"
+# Number of learners whose progress is collected by each task enqueued by `enqueue_progress_collection_for_users`
+PROGRESS_COLLECTION_BATCH_SIZE = 100
+# Requests to collect the progress of a learner in a course are ignored if it was already collected this recently.
+PROGRESS_COLLECTION_DEDUPLICATION_TIMEOUT = 60  # seconds
 
 log = logging.getLogger(__name__)
 
 
-@shared_task
+@lru_cache(maxsize=1024)
+def _parse_course_key(course_id: str) -> CourseKey:
+    """
+    Parse a course id, memoized so long-lived workers processing many tasks for the same course only parse it once.
+    Invalid keys raise `InvalidKeyError` and are not cached.
+    """
+    return CourseKey.from_string(course_id)
+
+
+@shared_task(ignore_result=True, track_started=False)
 @set_code_owner_attribute
-def collect_progress_for_user_in_course(course_id: str, user_id: str) -> None:
+def collect_progress_for_user_in_course(course_id: str, user_id: int) -> None:
     """
     Celery task that retrieves a learner's progress in a given course.
+
+    This is a thin wrapper around `_collect_progress_for_users` for a single learner.
+    """
+    _collect_progress_for_users(course_id, [user_id])
+
+
+@shared_task(ignore_result=True, track_started=False)
+@set_code_owner_attribute
+def collect_progress_for_users_in_course(course_id: str, user_ids: list[int]) -> None:
+    """
+    Celery task that retrieves the progress of several learners in a given course.
+
+    The course key is parsed, the enrollments (along with their users) are fetched, and the course's block structure is
+    collected once for the whole batch (or not at all when `course_progress_analytics_from_completions` is enabled,
+    since progress is then calculated from completions), so producers that need progress for many learners of the same
+    course should enqueue one task per batch of users rather than one task per user.
+    """
+    _collect_progress_for_users(course_id, user_ids)
+
+
+def enqueue_progress_collection_for_users(
+    course_id: str,
+    user_ids: list[int],
+    batch_size: int = PROGRESS_COLLECTION_BATCH_SIZE,
+) -> None:
+    """
+    Enqueue the collection of the progress of many learners in a given course.
+
+    The learners are split into batches of `batch_size`, each handled by one `collect_progress_for_users_in_course`
+    task, and the tasks are sent as a single group so they are published over one broker connection. Producers fanning
+    out over many learners should use this rather than enqueueing `collect_progress_for_user_in_course` per learner.
+    """
+    group(
+        collect_progress_for_users_in_course.s(course_id, user_ids[index:index + batch_size])
+        for index in range(0, len(user_ids), batch_size)
+    ).apply_async()
+
+
+def collect_progress_for_user_in_course_sync(course_id: str, user_id: int) -> None:
+    """
+    Retrieve a learner's progress in a given course and emit it inline, without going through the Celery broker.
+
+    Meant for callers that are already running in a worker (or can otherwise afford the work in-process) and for
+    which the cost of queueing a task would outweigh the progress calculation itself.
+    """
+    _collect_progress_for_users(course_id, [user_id])
+
+
+def _collect_progress_for_users(course_id: str, user_ids: list[int]) -> None:
+    """
+    Calculate the progress of the given learners in a course and emit a tracking event for each of them.
     """
     try:
-        course_key = CourseKey.from_string(course_id)
+        course_key = _parse_course_key(course_id)
     except InvalidKeyError:
-        log.warning(f"Invalid course id {course_id}, aborting task.")
+        log.warning("Invalid course id %s, aborting task.", course_id)
         return
 
-    try:
-        user = User.objects.get(id=user_id)
-    except User.DoesNotExist:
-        log.warning(f"Could not retrieve a user with id {user_id}, aborting task.")
-        return
+    # Producers and in-flight messages from before the ids were typed as ints may still send them as strings, and the
+    # enrollments below are looked up by their int `user_id`.
+    user_ids = [int(user_id) for user_id in user_ids]
+    enrollments = {
+        enrollment.user_id: enrollment
+        for enrollment in get_course_enrollments_for_users(user_ids, course_key)
+    }
+    # The flag is checked once for the whole batch, and the completions aggregate doesn't need the course structure.
+    from_completions = course_progress_analytics_from_completions_is_enabled(course_key)
+    # Only the user-specific transforms need to run per learner, the collected course structure is shared by the batch.
+    collected_block_structure = None
+    events = []
+    for user_id in user_ids:
+        enrollment = enrollments.get(user_id)
+        if enrollment is None:
+            log.warning("Could not retrieve enrollment info for user %s in course %s", user_id, course_id)
+            continue
 
-    try:
-        enrollment = get_course_enrollment(user, course_key)
-        enrollment_mode = enrollment.mode
-    except AttributeError:
-        log.warning(f"Could not retrieve enrollment info for user {user.id} in course {course_id}")
-        return
+        # Claimed right before the work so that learners are only marked as collected once they actually are.
+        if not _claim_progress_collection(course_id, user_id):
+            continue
 
-    progress = calculate_progress_for_learner_in_course(course_key, user)
+        try:
+            if collected_block_structure is None and not from_completions:
+                collected_block_structure = get_block_structure_manager(course_key).get_collected()
 
-    # add a few extra fields to the returned data to make the event payload a bit more usable
-    progress["user_id"] = user.id
-    progress["course_id"] = course_id
-    progress["enrollment_mode"] = enrollment_mode
+            progress = _calculate_progress_for_user(
+                course_key, course_id, enrollment, collected_block_structure, from_completions
+            )
+        except Exception:  # pylint: disable=broad-except
+            # Don't let a single learner's failure drop the events already calculated for the rest of the batch, and
+            # release the claim so that the learner can be collected again right away.
+            log.exception("Could not calculate progress for user %s in course %s", user_id, course_id)
+            _release_progress_collection(course_id, user_id)
+            continue
+        events.append(progress)
 
-    context = {
-        "course_id": course_id,
-        "user_id": user.id,
-    }
-    with tracker.get_tracker().context(COURSE_COMPLETION_FOR_USER_EVENT_NAME, context):
-        tracker.emit(
-            COURSE_COMPLETION_FOR_USER_EVENT_NAME,
-            progress
-        )
+    _emit_progress_events(course_id, events)
+
+
+def _claim_progress_collection(course_id: str, user_id: int) -> bool:
+    """
+    Mark the progress of the learner in the course as being collected.
+
+    Producers may enqueue the same learner several times in a short window (e.g. on every visit to the course outline
+    or through at-least-once redelivery), and every duplicate would re-run the whole progress calculation.
+
+    Returns True if the progress wasn't already collected within the deduplication timeout, False otherwise.
+    """
+    # cache.add fails if the key already exists
+    key = _progress_collection_cache_key(course_id, user_id)
+    return cache.add(key, True, PROGRESS_COLLECTION_DEDUPLICATION_TIMEOUT)
+
+
+def _release_progress_collection(course_id: str, user_id: int) -> None:
+    """
+    Clear the mark set by `_claim_progress_collection`, for a collection that failed.
+    """
+    cache.delete(_progress_collection_cache_key(course_id, user_id))
+
+
+def _progress_collection_cache_key(course_id: str, user_id: int) -> str:
+    """
+    Return the cache key marking the progress of the learner in the course as collected.
+    """
+    return f"course_home_api.progress.{course_id}.{user_id}"
+
+
+def _calculate_progress_for_user(
+    course_key: CourseKey,
+    course_id: str,
+    enrollment: CourseEnrollment,
+    collected_block_structure: BlockStructureBlockData | None,
+    from_completions: bool,
+) -> dict:
+    """
+    Calculate a single learner's progress in the given course and return it as an event payload.
+
+    The block transformers need the full `User` to check access, but the event payload only needs ids and the
+    enrollment mode, which are read straight off the enrollment row.
+    """
+    progress = calculate_progress_for_learner_in_course(
+        course_key, enrollment.user, collected_block_structure, from_completions=from_completions
+    )
+
+    calculation_method = (
+        PROGRESS_CALCULATION_METHOD_COMPLETIONS if from_completions else PROGRESS_CALCULATION_METHOD_BLOCK_STRUCTURE
+    )
+    progress.update(zip(_PROGRESS_EVENT_FIELDS, (enrollment.user_id, course_id, enrollment.mode, calculation_method)))
+    return progress
+
+
+def _emit_progress_events(course_id: str, events: list) -> None:
+    """
+    Emit the buffered progress events of a batch back-to-back, once all of the progress calculations are done.
+
+    `eventtracking` has no bulk emit API, so each event is still emitted individually within its own user context, but
+    the tracker is only resolved once for the whole batch and events are emitted through it directly, rather than
+    through the module-level `tracker.emit` which looks the tracker up again on every call. Going through the tracker
+    (rather than its backends) keeps the context resolution and processors applied to these events.
+    """
+    if not events:
+        return
+
+    event_tracker = tracker.get_tracker()
+    if not event_tracker.backends:
+        # Nothing would receive the events, so skip the tracker's context and processor machinery and only keep a
+        # structured log line per event.
+        for progress in events:
+            log.info(COURSE_COMPLETION_FOR_USER_EVENT_NAME, extra=progress)
+        return
+
+    for progress in events:
+        context = {
+            "course_id": course_id,
+            "user_id": progress["user_id"],
+        }
+        with event_tracker.context(COURSE_COMPLETION_FOR_USER_EVENT_NAME, context):
+            event_tracker.emit(
+                COURSE_COMPLETION_FOR_USER_EVENT_NAME,
+                progress
+            )
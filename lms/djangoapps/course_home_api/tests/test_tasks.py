@@ -2,54 +2,66 @@
 Tests for Celery tasks used by the `course_home_api` app.
 """
 
-from unittest.mock import patch, MagicMock
+from unittest.mock import call, patch
 
+from edx_toggles.toggles.testutils import override_waffle_flag
 from opaque_keys.edx.keys import CourseKey
 from testfixtures import LogCapture
-from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
 
 from common.djangoapps.student.tests.factories import CourseEnrollmentFactory, UserFactory
+from lms.djangoapps.course_home_api.progress.api import calculate_progress_for_learner_in_course
 from lms.djangoapps.course_home_api.tasks import (
     COURSE_COMPLETION_FOR_USER_EVENT_NAME,
-    collect_progress_for_user_in_course
+    PROGRESS_CALCULATION_METHOD_BLOCK_STRUCTURE,
+    PROGRESS_CALCULATION_METHOD_COMPLETIONS,
+    collect_progress_for_user_in_course,
+    collect_progress_for_user_in_course_sync,
+    collect_progress_for_users_in_course,
+    enqueue_progress_collection_for_users,
 )
-from openedx.core.djangoapps.catalog.tests.factories import CourseFactory, CourseRunFactory
+from lms.djangoapps.course_home_api.toggles import COURSE_HOME_COURSE_PROGRESS_ANALYTICS_FROM_COMPLETIONS
+from openedx.core.djangoapps.content.course_overviews.tests.factories import CourseOverviewFactory
+from openedx.core.djangolib.testing.utils import CacheIsolationTestCase
 
 LOG_PATH = 'lms.djangoapps.course_home_api.tasks'
 
 
-class CalculateCompletionTaskTests(ModuleStoreTestCase):
+class CalculateCompletionTaskTests(CacheIsolationTestCase):
     """
     Tests for the `emit_course_completion_analytics_for_user` Celery task.
     """
+    ENABLED_CACHES = ['default']
+
     def setUp(self):
         super().setUp()
         self.user = UserFactory()
-        self.course_run = CourseRunFactory()
-        self.course_run_key_string = self.course_run['key']
-        self.course = CourseFactory(key=self.course_run_key_string, course_runs=[self.course_run])
+        self.course_overview = CourseOverviewFactory()
+        self.course_run_key_string = str(self.course_overview.id)
         self.enrollment = CourseEnrollmentFactory(
             user=self.user,
-            course_id=self.course_run_key_string,
+            course=self.course_overview,
             mode="verified"
         )
 
-    @patch("lms.djangoapps.course_home_api.tasks.calculate_progress_for_learner_in_course")
-    @patch("lms.djangoapps.course_home_api.tasks.tracker.emit")
-    @patch("lms.djangoapps.course_home_api.tasks.tracker.get_tracker")
-    def test_successful_event_emission(self, mock_get_tracker, mock_tracker, mock_progress):
+        # Every test needs these patched, so the patchers are started once here rather than decorating each test.
+        self.mock_progress = self._start_patcher("calculate_progress_for_learner_in_course")
+        self.mock_get_tracker = self._start_patcher("tracker.get_tracker")
+        self.mock_tracker = self.mock_get_tracker.return_value.emit
+        self.mock_get_manager = self._start_patcher("get_block_structure_manager")
+
+    def _start_patcher(self, target):
         """
-        Test to ensure a tracker event is emit by the task with the expected completion information.
+        Patch the given attribute of the tasks module for the duration of the test and return the mock.
         """
-        mock_context_manager = MagicMock()
-        mock_context_manager.__enter__.return_value = None
-        mock_context_manager.__exit__.return_value = None
-
-        mock_tracker_instance = MagicMock()
-        mock_tracker_instance.context.return_value = mock_context_manager
-        mock_get_tracker.return_value = mock_tracker_instance
+        patcher = patch(f"lms.djangoapps.course_home_api.tasks.{target}")
+        self.addCleanup(patcher.stop)
+        return patcher.start()
 
-        mock_progress.return_value = {
+    def test_successful_event_emission(self):
+        """
+        Test to ensure a tracker event is emit by the task with the expected completion information.
+        """
+        self.mock_progress.return_value = {
             "complete_count": 5,
             "incomplete_count": 2,
             "locked_count": 1,
@@ -63,6 +75,7 @@ class CalculateCompletionTaskTests(ModuleStoreTestCase):
             "user_id": self.user.id,
             "course_id": self.course_run_key_string,
             "enrollment_mode": self.enrollment.mode,
+            "calculation_method": PROGRESS_CALCULATION_METHOD_BLOCK_STRUCTURE,
             "complete_count": 5,
             "incomplete_count": 2,
             "locked_count": 1,
@@ -73,56 +86,253 @@ class CalculateCompletionTaskTests(ModuleStoreTestCase):
         }
 
         collect_progress_for_user_in_course(self.course_run_key_string, self.user.id)
-        mock_progress.assert_called_once_with(CourseKey.from_string(self.course_run_key_string), self.user)
-        mock_tracker_instance.context.assert_called_once_with(
+        self.mock_progress.assert_called_once_with(
+            CourseKey.from_string(self.course_run_key_string),
+            self.user,
+            self.mock_get_manager.return_value.get_collected.return_value,
+            from_completions=False,
+        )
+        self.mock_get_tracker.assert_called_once_with()
+        self.mock_get_tracker.return_value.context.assert_called_once_with(
             COURSE_COMPLETION_FOR_USER_EVENT_NAME,
             {
                 "course_id": self.course_run_key_string,
                 "user_id": self.user.id,
             },
         )
-        mock_tracker.assert_called_once_with(
+        self.mock_tracker.assert_called_once_with(
             COURSE_COMPLETION_FOR_USER_EVENT_NAME,
             expected_data,
         )
 
-    @patch("lms.djangoapps.course_home_api.tasks.calculate_progress_for_learner_in_course")
-    @patch("lms.djangoapps.course_home_api.tasks.get_course_enrollment")
-    @patch("lms.djangoapps.course_home_api.tasks.tracker.emit")
-    def test_cannot_retrieve_enrollment_info(self, mock_tracker, mock_get_enrollment, mock_progress):
+    @patch("lms.djangoapps.course_home_api.progress.api.get_course_blocks_completion_summary")
+    def test_event_emission_no_units(self, mock_get_summary):
+        """
+        Test to ensure a course without any units emits zeroed progress rather than failing the task.
+        """
+        self.mock_progress.side_effect = calculate_progress_for_learner_in_course
+        mock_get_summary.return_value = {
+            "complete_count": 0,
+            "incomplete_count": 0,
+            "locked_count": 0,
+        }
+
+        expected_data = {
+            "user_id": self.user.id,
+            "course_id": self.course_run_key_string,
+            "enrollment_mode": self.enrollment.mode,
+            "calculation_method": PROGRESS_CALCULATION_METHOD_BLOCK_STRUCTURE,
+            "complete_count": 0,
+            "incomplete_count": 0,
+            "locked_count": 0,
+            "total_count": 0,
+            "complete_percentage": 0.0,
+            "locked_percentage": 0.0,
+            "incomplete_percentage": 0.0,
+        }
+
+        collect_progress_for_user_in_course(self.course_run_key_string, self.user.id)
+        self.mock_tracker.assert_called_once_with(COURSE_COMPLETION_FOR_USER_EVENT_NAME, expected_data)
+
+    @override_waffle_flag(COURSE_HOME_COURSE_PROGRESS_ANALYTICS_FROM_COMPLETIONS, active=True)
+    def test_event_emission_from_completions(self):
+        """
+        Test to ensure the course structure isn't collected when the progress is calculated from completions, and that
+        the event says which calculation method produced it.
+        """
+        self.mock_progress.return_value = {}
+
+        collect_progress_for_user_in_course(self.course_run_key_string, self.user.id)
+
+        self.mock_get_manager.assert_not_called()
+        self.mock_progress.assert_called_once_with(
+            CourseKey.from_string(self.course_run_key_string),
+            self.user,
+            None,
+            from_completions=True,
+        )
+        self.mock_tracker.assert_called_once_with(
+            COURSE_COMPLETION_FOR_USER_EVENT_NAME,
+            {
+                "user_id": self.user.id,
+                "course_id": self.course_run_key_string,
+                "enrollment_mode": self.enrollment.mode,
+                "calculation_method": PROGRESS_CALCULATION_METHOD_COMPLETIONS,
+            },
+        )
+
+    def test_cannot_retrieve_enrollment_info(self):
         """
         Test to ensure the task is aborted if we cannot retrieve enrollment info for the user in the specified course.
         """
-        mock_get_enrollment.return_value = None
+        unenrolled_user = UserFactory()
 
         expected_message = (
-            f"Could not retrieve enrollment info for user {self.user.id} in course {self.course_run_key_string}"
+            f"Could not retrieve enrollment info for user {unenrolled_user.id} in course {self.course_run_key_string}"
         )
 
         with LogCapture() as log:
-            collect_progress_for_user_in_course(self.course_run_key_string, self.user.id)
+            collect_progress_for_user_in_course(self.course_run_key_string, unenrolled_user.id)
 
-        mock_get_enrollment.assert_called_once_with(self.user, CourseKey.from_string(self.course_run_key_string))
         log.check_present((LOG_PATH, "WARNING", expected_message),)
-        mock_progress.assert_not_called()
-        mock_tracker.assert_not_called()
+        self.mock_get_manager.assert_not_called()
+        self.mock_progress.assert_not_called()
+        self.mock_tracker.assert_not_called()
 
-    @patch("lms.djangoapps.course_home_api.tasks.calculate_progress_for_learner_in_course")
-    @patch("lms.djangoapps.course_home_api.tasks.tracker.emit")
-    def test_aborted_task_user_dne(self, mock_tracker, mock_progress):
+    def test_aborted_task_user_dne(self):
         """
         Test to ensure the task is aborted if we cannot find the user for some reason.
         """
         collect_progress_for_user_in_course(self.course_run_key_string, 8675309)
-        mock_progress.assert_not_called()
-        mock_tracker.assert_not_called()
+        self.mock_get_manager.assert_not_called()
+        self.mock_progress.assert_not_called()
+        self.mock_tracker.assert_not_called()
 
-    @patch("lms.djangoapps.course_home_api.tasks.calculate_progress_for_learner_in_course")
-    @patch("lms.djangoapps.course_home_api.tasks.tracker.emit")
-    def test_aborted_task_bad_course_id(self, mock_tracker, mock_progress):
+    def test_aborted_task_bad_course_id(self):
         """
         Test to ensure the task is aborted if the course key provided is no good.
         """
         collect_progress_for_user_in_course("nonsense", self.user.id)
-        mock_progress.assert_not_called()
-        mock_tracker.assert_not_called()
+        self.mock_progress.assert_not_called()
+        self.mock_tracker.assert_not_called()
+
+    def test_batched_event_emission(self):
+        """
+        Test to ensure the batched task emits one event per enrolled learner and skips users that do not exist.
+        """
+        other_user = UserFactory()
+        CourseEnrollmentFactory(user=other_user, course=self.course_overview, mode="audit")
+        self.mock_progress.return_value = {}
+
+        collect_progress_for_users_in_course(self.course_run_key_string, [self.user.id, 8675309, other_user.id])
+
+        course_key = CourseKey.from_string(self.course_run_key_string)
+        block_structure = self.mock_get_manager.return_value.get_collected.return_value
+        self.mock_get_manager.return_value.get_collected.assert_called_once_with()
+        assert self.mock_progress.call_args_list == [
+            call(course_key, self.user, block_structure, from_completions=False),
+            call(course_key, other_user, block_structure, from_completions=False),
+        ]
+        assert self.mock_tracker.call_count == 2
+        assert self.mock_tracker.call_args_list[1] == call(
+            COURSE_COMPLETION_FOR_USER_EVENT_NAME,
+            {
+                "user_id": other_user.id,
+                "course_id": self.course_run_key_string,
+                "enrollment_mode": "audit",
+                "calculation_method": PROGRESS_CALCULATION_METHOD_BLOCK_STRUCTURE,
+            },
+        )
+
+    def test_batch_continues_after_a_failed_calculation(self):
+        """
+        Test to ensure a failure calculating one learner's progress doesn't drop the events of the rest of the batch.
+        """
+        other_user = UserFactory()
+        CourseEnrollmentFactory(user=other_user, course=self.course_overview, mode="audit")
+        self.mock_progress.side_effect = [Exception("boom"), {}]
+
+        with LogCapture() as log:
+            collect_progress_for_users_in_course(self.course_run_key_string, [self.user.id, other_user.id])
+
+        log.check_present(
+            (
+                LOG_PATH,
+                "ERROR",
+                f"Could not calculate progress for user {self.user.id} in course {self.course_run_key_string}",
+            ),
+        )
+        self.mock_tracker.assert_called_once_with(
+            COURSE_COMPLETION_FOR_USER_EVENT_NAME,
+            {
+                "user_id": other_user.id,
+                "course_id": self.course_run_key_string,
+                "enrollment_mode": "audit",
+                "calculation_method": PROGRESS_CALCULATION_METHOD_BLOCK_STRUCTURE,
+            },
+        )
+
+    def test_sync_event_emission(self):
+        """
+        Test to ensure the synchronous variant emits the same event as the task without going through Celery.
+        """
+        self.mock_progress.return_value = {}
+
+        collect_progress_for_user_in_course_sync(self.course_run_key_string, self.user.id)
+
+        self.mock_tracker.assert_called_once_with(
+            COURSE_COMPLETION_FOR_USER_EVENT_NAME,
+            {
+                "user_id": self.user.id,
+                "course_id": self.course_run_key_string,
+                "enrollment_mode": self.enrollment.mode,
+                "calculation_method": PROGRESS_CALCULATION_METHOD_BLOCK_STRUCTURE,
+            },
+        )
+
+    def test_string_user_id(self):
+        """
+        Test to ensure learners are still found when their id is sent as a string.
+        """
+        self.mock_progress.return_value = {}
+
+        collect_progress_for_user_in_course(self.course_run_key_string, str(self.user.id))
+
+        self.mock_progress.assert_called_once()
+        assert self.mock_tracker.call_args.args[1]["user_id"] == self.user.id
+
+    def test_duplicate_requests_are_ignored(self):
+        """
+        Test to ensure the progress of a learner is only collected once when duplicate requests arrive back-to-back.
+        """
+        self.mock_progress.return_value = {}
+
+        collect_progress_for_user_in_course(self.course_run_key_string, self.user.id)
+        collect_progress_for_user_in_course(self.course_run_key_string, self.user.id)
+        collect_progress_for_users_in_course(self.course_run_key_string, [self.user.id])
+
+        self.mock_progress.assert_called_once()
+        self.mock_tracker.assert_called_once()
+
+    def test_failed_collection_is_not_deduplicated(self):
+        """
+        Test to ensure a learner whose progress calculation failed can be collected again right away.
+        """
+        self.mock_progress.side_effect = [Exception("boom"), {}]
+
+        collect_progress_for_user_in_course(self.course_run_key_string, self.user.id)
+        self.mock_tracker.assert_not_called()
+
+        collect_progress_for_user_in_course(self.course_run_key_string, self.user.id)
+        assert self.mock_progress.call_count == 2
+        self.mock_tracker.assert_called_once()
+
+    @patch("lms.djangoapps.course_home_api.tasks._collect_progress_for_users")
+    def test_enqueue_progress_collection_for_users(self, mock_collect):
+        """
+        Test to ensure the learners are split into batches, each collected by its own task.
+        """
+        enqueue_progress_collection_for_users(self.course_run_key_string, [1, 2, 3, 4, 5], batch_size=2)
+
+        assert mock_collect.call_args_list == [
+            call(self.course_run_key_string, [1, 2]),
+            call(self.course_run_key_string, [3, 4]),
+            call(self.course_run_key_string, [5]),
+        ]
+
+    def test_event_logged_without_tracker_backends(self):
+        """
+        Test to ensure the progress is logged rather than emitted if the tracker has no backends configured.
+        """
+        self.mock_get_tracker.return_value.backends = {}
+        self.mock_progress.return_value = {}
+
+        with LogCapture() as log:
+            collect_progress_for_user_in_course(self.course_run_key_string, self.user.id)
+
+        log.check_present((LOG_PATH, "INFO", COURSE_COMPLETION_FOR_USER_EVENT_NAME),)
+        (record,) = [record for record in log.records if record.name == LOG_PATH and record.levelname == "INFO"]
+        assert record.user_id == self.user.id
+        assert record.enrollment_mode == self.enrollment.mode
+        self.mock_get_tracker.return_value.context.assert_not_called()
+        self.mock_tracker.assert_not_called()
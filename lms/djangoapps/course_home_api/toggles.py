@@ -51,6 +51,23 @@ COURSE_HOME_SEND_COURSE_PROGRESS_ANALYTICS_FOR_STUDENT = CourseWaffleFlag(
 )
 
 
+# Waffle flag to calculate the course progress analytics from a single aggregate query over the learner's completions.
+#
+# .. toggle_name: course_home.course_progress_analytics_from_completions
+# .. toggle_implementation: CourseWaffleFlag
+# .. toggle_default: False
+# .. toggle_description: When enabled, the course progress analytics events are built from one aggregate query over
+#   the learner's BlockCompletion records instead of walking the learner's course block tree. The counts are then
+#   component-level, only cover blocks the learner has interacted with, and never report locked content, so this is
+#   meant to compare the cost and the numbers of both approaches before choosing one.
+# .. toggle_use_cases: temporary
+# .. toggle_creation_date: 2026-10-14
+# .. toggle_target_removal_date: 2027-04-14
+COURSE_HOME_COURSE_PROGRESS_ANALYTICS_FROM_COMPLETIONS = CourseWaffleFlag(
+    f'{WAFFLE_FLAG_NAMESPACE}.course_progress_analytics_from_completions', __name__
+)
+
+
 def course_home_mfe_progress_tab_is_active(course_key):
     # Avoiding a circular dependency
     from .models import DisableProgressPageStackedConfig
@@ -73,3 +90,10 @@ def send_course_progress_analytics_for_student_is_enabled(course_key):
     Returns True if the course completion analytics feature is enabled for a given course.
     """
     return COURSE_HOME_SEND_COURSE_PROGRESS_ANALYTICS_FOR_STUDENT.is_enabled(course_key)
+
+
+def course_progress_analytics_from_completions_is_enabled(course_key):
+    """
+    Returns True if the course progress analytics should be calculated from the learner's completions in a course.
+    """
+    return COURSE_HOME_COURSE_PROGRESS_ANALYTICS_FROM_COMPLETIONS.is_enabled(course_key)
@@ -12,7 +12,7 @@ import ddt
 import freezegun
 from django.core.files.base import ContentFile
 from django.utils.timezone import now
-from django.test import RequestFactory
+from django.test import RequestFactory, override_settings
 from edxval import api
 from xblock.django.request import DjangoWebobRequest
 from webob import Request, Response
@@ -195,6 +195,14 @@ class TestVideo(BaseTestVideoXBlock):
         assert self.block.speed == 1.0
         assert self.block.global_speed == 1.0
 
+    def test_handle_ajax_for_non_str_transcript_language(self):
+        """
+        Non-str transcript languages are saved as they are, rather than failing to be interned.
+        """
+        response = self.block.handle_ajax('save_user_state', {'transcript_language': ['uk']})
+        assert json.loads(response)['success']
+        assert self.block.transcript_language == ['uk']
+
     def test_handle_ajax(self):
 
         data = [
@@ -406,6 +414,37 @@ class TestTranscriptAvailableTranslationsDispatch(TestVideo):  # lint-amnesty, p
         response = self.block.transcript(request=request, dispatch='available_translations')
         assert response.status_code == 404
 
+    def test_available_translations_cached_until_transcripts_change(self):
+        """
+        Verified translations are reused while the transcript fields are unchanged,
+        and recomputed as soon as they change.
+        """
+        _upload_file(_create_srt_file(), self.block.location, os.path.split(self.srt_file.name)[1])
+        with patch.object(
+            self.block, 'available_translations', wraps=self.block.available_translations
+        ) as mock_available_translations:
+            for __ in range(2):
+                request = Request.blank('/available_translations')
+                response = self.block.transcript(request=request, dispatch='available_translations')
+                assert json.loads(response.body.decode('utf-8')) == ['uk']
+            assert mock_available_translations.call_count == 1
+
+            self.block.youtube_id_1_0 = 'OEoXaMPEzfM'
+            request = Request.blank('/available_translations')
+            self.block.transcript(request=request, dispatch='available_translations')
+            assert mock_available_translations.call_count == 2
+
+            self.block.html5_sources = ['example.mp4']
+            request = Request.blank('/available_translations')
+            self.block.transcript(request=request, dispatch='available_translations')
+            assert mock_available_translations.call_count == 3
+
+            self.block.transcripts = {}
+            request = Request.blank('/available_translations')
+            response = self.block.transcript(request=request, dispatch='available_translations')
+            assert response.status_code == 404
+            assert mock_available_translations.call_count == 4
+
 
 @ddt.ddt
 class TestTranscriptAvailableTranslationsBumperDispatch(TestVideo):  # lint-amnesty, pylint: disable=test-inherits-tests
@@ -793,6 +832,35 @@ class TestTranscriptTranslationGetDispatch(TestVideo):  # lint-amnesty, pylint:
         if sub:
             assert ('Location', f'/static/dummy/static/subs_{sub}.srt.sjson') in response.headerlist
 
+    @override_settings(VIDEO_TRANSCRIPTS_STATIC_ACCEL_REDIRECT_PREFIX='/static-internal')
+    def test_translation_static_transcript_accel_redirect(self):
+        """
+        Set course static_asset_path and ensure the web server is asked to serve the static transcript
+        if it isn't found in the contentstore and the accel-redirect prefix is configured.
+        """
+        self._set_static_asset_path()
+
+        request = _create_djangowebobrequest_object_for_url('/translation/en?videoId=12345')
+        response = self.block.transcript(request=request, dispatch='translation/en')
+        assert response.status == '200 OK'
+        assert ('X-Accel-Redirect', '/static-internal/dummy/static/subs_12345.srt.sjson') in response.headerlist
+        assert response.content_type == 'application/json'
+
+    def test_translation_static_transcript_inherited_asset_path(self):
+        """
+        Ensure the static_asset_path inherited by the block is used without fetching the course
+        from the modulestore.
+        """
+        self.block.static_asset_path = 'inherited/static'
+        test_modulestore = MagicMock()
+        self.block.runtime.modulestore = test_modulestore
+
+        request = _create_djangowebobrequest_object_for_url('/translation/en?videoId=12345')
+        response = self.block.transcript(request=request, dispatch='translation/en')
+        assert response.status == '307 Temporary Redirect'
+        assert ('Location', '/static/inherited/static/subs_12345.srt.sjson') in response.headerlist
+        test_modulestore.get_course.assert_not_called()
+
     @patch('xmodule.video_block.VideoBlock.course_id', return_value='not_a_course_locator')
     def test_translation_static_non_course(self, __):
         """
@@ -3901,6 +3901,14 @@ VIDEO_TRANSCRIPTS_SETTINGS = dict(
 
 VIDEO_TRANSCRIPTS_MAX_AGE = 31536000
 
+# .. setting_name: VIDEO_TRANSCRIPTS_STATIC_ACCEL_REDIRECT_PREFIX
+# .. setting_default: None
+# .. setting_description: When set, English video transcripts that fall back to the course's static folder are
+#   served through an nginx ``X-Accel-Redirect`` to ``<prefix>/<static asset path>/<transcript file>`` instead of
+#   redirecting the browser to ``/static/``, saving the client a second request. The prefix must match an
+#   ``internal`` nginx location aliasing the static files directory, e.g. ``/static-internal``.
+VIDEO_TRANSCRIPTS_STATIC_ACCEL_REDIRECT_PREFIX = None
+
 # Source:
 # http://loc.gov/standards/iso639-2/ISO-639-2_utf-8.txt according to http://en.wikipedia.org/wiki/ISO_639-1
 # Note that this is used as the set of choices to the `code` field of the
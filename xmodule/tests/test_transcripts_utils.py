@@ -11,7 +11,7 @@ from unittest import mock, TestCase
 
 import ddt
 
-from ..video_block.transcripts_utils import get_transcript_link_from_youtube
+from ..video_block.transcripts_utils import get_transcript_link_from_youtube, remove_unique_subs_from_store
 
 YOUTUBE_VIDEO_ID = "z-LoKnweV6w"
 
@@ -144,3 +144,20 @@ class TranscriptsUtilsTest(TestCase):
 
         english_language_caption_link = get_transcript_link_from_youtube(YOUTUBE_VIDEO_ID)
         self.assertIsNone(english_language_caption_link)
+
+    @mock.patch('xmodule.video_block.transcripts_utils.Transcript.delete_asset')
+    def test_remove_unique_subs_from_store(self, mock_delete_asset):
+        """
+        Each distinct, non-empty subs id has its transcript asset deleted exactly once
+        """
+        item = mock.Mock()
+
+        remove_unique_subs_from_store(['sub_id', '', 'youtube_id', None, 'sub_id'], item, 'en')
+
+        self.assertEqual(
+            mock_delete_asset.call_args_list,
+            [
+                mock.call(item.location, 'subs_sub_id.srt.sjson'),
+                mock.call(item.location, 'subs_youtube_id.srt.sjson'),
+            ]
+        )
@@ -118,6 +118,13 @@ def save_to_store(content, name, mime_type, location):
     return content_location
 
 
+def sjson_filedata(subs):
+    """
+    Serialize sjson `subs` into the bytes stored in `StaticContent`.
+    """
+    return json.dumps(subs, indent=2).encode('utf-8')
+
+
 def save_subs_to_store(subs, subs_id, item, language='en'):
     """
     Save transcripts into `StaticContent`.
@@ -129,7 +136,7 @@ def save_subs_to_store(subs, subs_id, item, language='en'):
 
     Returns: location of saved subtitles.
     """
-    filedata = json.dumps(subs, indent=2).encode('utf-8')
+    filedata = sjson_filedata(subs)
     filename = subs_filename(subs_id, language)
     return save_to_store(filedata, filename, 'application/json', item.location)
 
@@ -293,6 +300,17 @@ def remove_subs_from_store(subs_id, item, lang='en'):
     Transcript.delete_asset(item.location, filename)
 
 
+def remove_unique_subs_from_store(subs_ids, item, lang='en'):
+    """
+    Remove from store the transcripts content of several subs ids, if it exists.
+
+    Empty and duplicate subs ids are skipped, so that each transcript asset is only deleted once. Each remaining
+    subs id is still removed with its own `delete_asset` call.
+    """
+    for subs_id in dict.fromkeys(subs_id for subs_id in subs_ids if subs_id):
+        remove_subs_from_store(subs_id, item, lang)
+
+
 def generate_subs_from_source(speed_subs, subs_type, subs_filedata, block, language='en'):
     """Generate transcripts from source files (like SubRip format, etc.)
     and save them to assets for `item` module.
@@ -506,7 +524,7 @@ def manage_video_subtitles_save(item, user, old_metadata=None, generate_translat
                     generate_sjson_for_all_speeds(
                         item,
                         item.transcripts[lang],
-                        {speed: subs_id for subs_id, speed in youtube_speed_dict(item).items()},
+                        youtube_ids_by_speed(youtube_speed_dict(item)),
                         lang,
                     )
                 except TranscriptException:
@@ -518,7 +536,7 @@ def manage_video_subtitles_save(item, user, old_metadata=None, generate_translat
 
 def youtube_speed_dict(item):
     """
-    Returns {speed: youtube_ids, ...} dict for existing youtube_ids
+    Returns {youtube_id: speed, ...} dict for existing youtube_ids
     """
     yt_ids = [item.youtube_id_0_75, item.youtube_id_1_0, item.youtube_id_1_25, item.youtube_id_1_5]
     yt_speeds = [0.75, 1.00, 1.25, 1.50]
@@ -526,6 +544,14 @@ def youtube_speed_dict(item):
     return youtube_ids
 
 
+def youtube_ids_by_speed(youtube_speeds):
+    """
+    Returns {speed: youtube_id, ...} dict from the {youtube_id: speed, ...} dict
+    returned by `youtube_speed_dict`, in the shape expected by `generate_sjson_for_all_speeds`.
+    """
+    return {speed: youtube_id for youtube_id, speed in youtube_speeds.items()}
+
+
 def subs_filename(subs_id, lang='en'):
     """
     Generate proper filename for storage.
@@ -539,6 +565,9 @@ def subs_filename(subs_id, lang='en'):
 def generate_sjson_for_all_speeds(block, user_filename, result_subs_dict, lang):
     """
     Generates sjson from srt for given lang.
+
+    Returns the generated sjson subs for speed 1.0, so that callers do not have to
+    read them back from the contentstore.
     """
     _ = block.runtime.service(block, "i18n").gettext
 
@@ -554,7 +583,7 @@ def generate_sjson_for_all_speeds(block, user_filename, result_subs_dict, lang):
         lang = block.transcript_language
 
     # Used utf-8-sig encoding type instead of utf-8 to remove BOM(Byte Order Mark), e.g. U+FEFF
-    generate_subs_from_source(
+    return generate_subs_from_source(
         result_subs_dict,
         os.path.splitext(user_filename)[1][1:],
         srt_transcripts.data.decode('utf-8-sig'),
@@ -583,8 +612,9 @@ def get_or_create_sjson(block, transcripts):
     try:
         sjson_transcript = Transcript.asset(block.location, source_subs_id, block.transcript_language).data
     except NotFoundError:  # generating sjson from srt
-        generate_sjson_for_all_speeds(block, user_filename, result_subs_dict, block.transcript_language)
-        sjson_transcript = Transcript.asset(block.location, source_subs_id, block.transcript_language).data
+        sjson_transcript = sjson_filedata(
+            generate_sjson_for_all_speeds(block, user_filename, result_subs_dict, block.transcript_language)
+        )
     return sjson_transcript
 
 
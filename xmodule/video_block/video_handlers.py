@@ -6,17 +6,23 @@ StudioViewHandlers are handlers for video descriptor instance.
 """
 
 
+import hashlib
 import json
 import logging
 import math
+import sys
 
+from django.conf import settings
+from django.core.cache import cache
 from django.core.files.base import ContentFile
+from django.utils.functional import cached_property
 from django.utils.timezone import now
 from edxval.api import create_external_video, create_or_update_video_transcript, delete_video_transcript
 from opaque_keys.edx.locator import CourseLocator, LibraryLocatorV2
 from webob import Response
 from xblock.core import XBlock
 from xblock.exceptions import JsonHandlerError
+from xblock.fields import EXPLICITLY_SET
 
 from xmodule.exceptions import NotFoundError
 from xmodule.fields import RelativeTime
@@ -28,17 +34,26 @@ from .transcripts_utils import (
     TranscriptsGenerationException,
     clean_video_id,
     generate_sjson_for_all_speeds,
+    generate_subs,
     get_html5_ids,
     get_or_create_sjson,
     get_transcript,
     get_transcript_from_contentstore,
     remove_subs_from_store,
+    remove_unique_subs_from_store,
+    sjson_filedata,
     subs_filename,
+    youtube_ids_by_speed,
     youtube_speed_dict
 )
 
 log = logging.getLogger(__name__)
 
+# How long, in seconds, a serialized `available_translations` list is cached for.
+# Edits to the block's transcript fields change the cache key; this only bounds how
+# long a change made directly in the contentstore or edx-val can go unnoticed.
+AVAILABLE_TRANSLATIONS_CACHE_TIMEOUT = 60
+
 
 # Disable no-member warning:
 # pylint: disable=no-member
@@ -47,12 +62,39 @@ def to_boolean(value):
     """
     Convert a value from a GET or POST request parameter to a bool
     """
-    if isinstance(value, bytes):
-        value = value.decode('ascii', errors='replace')
     if isinstance(value, str):
         return value.lower() == 'true'
-    else:
-        return bool(value)
+    if isinstance(value, bytes):
+        return value.decode('ascii', errors='replace').lower() == 'true'
+    return bool(value)
+
+
+def intern_if_str(value):
+    """
+    Intern a str value, so that comparisons against string literals can short-circuit on identity.
+
+    Values of any other type are returned unchanged.
+    """
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+# User state fields that can be updated through the `save_user_state` ajax dispatch
+USER_STATE_ACCEPTED_KEYS = frozenset((
+    'speed', 'auto_advance', 'saved_video_position', 'transcript_language',
+    'transcript_download_format', 'youtube_is_available',
+    'bumper_last_view_date', 'bumper_do_not_show_again'
+))
+
+# Conversions applied to the raw request values of the user state fields, if any
+USER_STATE_CONVERSIONS = {
+    'speed': json.loads,
+    'auto_advance': json.loads,
+    'saved_video_position': RelativeTime.isotime_to_timedelta,
+    'transcript_language': intern_if_str,
+    'youtube_is_available': json.loads,
+    'bumper_last_view_date': to_boolean,
+    'bumper_do_not_show_again': to_boolean,
+}
 
 
 class VideoStudentViewHandlers:
@@ -66,41 +108,25 @@ class VideoStudentViewHandlers:
         """
         Update values of xfields, that were changed by student.
         """
-        accepted_keys = [
-            'speed', 'auto_advance', 'saved_video_position', 'transcript_language',
-            'transcript_download_format', 'youtube_is_available',
-            'bumper_last_view_date', 'bumper_do_not_show_again'
-        ]
-
-        conversions = {
-            'speed': json.loads,
-            'auto_advance': json.loads,
-            'saved_video_position': RelativeTime.isotime_to_timedelta,
-            'youtube_is_available': json.loads,
-            'bumper_last_view_date': to_boolean,
-            'bumper_do_not_show_again': to_boolean,
-        }
-
         if dispatch == 'save_user_state':
-            for key in data:
-                if key in accepted_keys:
-                    if key in conversions:
-                        value = conversions[key](data[key])
-                    else:
-                        value = data[key]
+            for key, raw_value in data.items():
+                if key not in USER_STATE_ACCEPTED_KEYS:
+                    continue
 
-                    if key == 'bumper_last_view_date':
-                        value = now()
+                conversion = USER_STATE_CONVERSIONS.get(key)
+                value = conversion(raw_value) if conversion is not None else raw_value
 
-                    if key == 'speed' and math.isnan(value):
-                        message = f"Invalid speed value {value}, must be a float."
-                        log.warning(message)
-                        return json.dumps({'success': False, 'error': message})
+                if key == 'bumper_last_view_date':
+                    value = now()
+                elif key == 'speed' and math.isnan(value):
+                    message = f"Invalid speed value {value}, must be a float."
+                    log.warning(message)
+                    return json.dumps({'success': False, 'error': message})
 
-                    setattr(self, key, value)
+                setattr(self, key, value)
 
-                    if key == 'speed':
-                        self.global_speed = self.speed
+                if key == 'speed':
+                    self.global_speed = self.speed
 
             return json.dumps({'success': True})
 
@@ -158,13 +184,13 @@ class VideoStudentViewHandlers:
                 sjson_transcript = Transcript.asset(self.location, youtube_id, self.transcript_language).data
             except NotFoundError:
                 log.info("Can't find content in storage for %s transcript: generating.", youtube_id)
-                generate_sjson_for_all_speeds(
+                subs = generate_sjson_for_all_speeds(
                     self,
                     other_lang[self.transcript_language],
-                    {speed: youtube_id for youtube_id, speed in youtube_ids.items()},
+                    youtube_ids_by_speed(youtube_ids),
                     self.transcript_language
                 )
-                sjson_transcript = Transcript.asset(self.location, youtube_id, self.transcript_language).data
+                sjson_transcript = sjson_filedata(generate_subs(youtube_ids[youtube_id], 1, subs))
 
             return sjson_transcript
         else:
@@ -208,23 +234,35 @@ class VideoStudentViewHandlers:
             transcript_name = transcripts["sub"]
 
         if transcript_name:
-            # Get the asset path for course
-            asset_path = None
-            course = self.runtime.modulestore.get_course(self.course_id)
-            if course.static_asset_path:
-                asset_path = course.static_asset_path
-            else:
-                # It seems static_asset_path is not set in any XMLModuleStore courses.
-                asset_path = getattr(course, 'data_dir', '')
+            # Get the asset path for course. `static_asset_path` is inherited from the course, so only
+            # fetch the course itself from the modulestore if the block doesn't have it.
+            asset_path = getattr(self, 'static_asset_path', None)
+            if not asset_path:
+                course = self.runtime.modulestore.get_course(self.course_id)
+                if course.static_asset_path:
+                    asset_path = course.static_asset_path
+                else:
+                    # It seems static_asset_path is not set in any XMLModuleStore courses.
+                    asset_path = getattr(course, 'data_dir', '')
 
             if asset_path:
-                response = Response(
-                    status=307,
-                    location='/static/{}/{}'.format(
-                        asset_path,
-                        subs_filename(transcript_name, self.transcript_language)
-                    )
+                static_path = '{}/{}'.format(
+                    asset_path,
+                    subs_filename(transcript_name, self.transcript_language)
                 )
+                accel_redirect_prefix = getattr(settings, 'VIDEO_TRANSCRIPTS_STATIC_ACCEL_REDIRECT_PREFIX', None)
+                if accel_redirect_prefix:
+                    # Let the web server serve the static transcript itself instead of sending the client
+                    # back through Django for it.
+                    response = Response(
+                        status=200,
+                        headerlist=[
+                            ('X-Accel-Redirect', f'{accel_redirect_prefix}/{static_path}'),
+                            ('Content-Type', 'application/json'),
+                        ],
+                    )
+                else:
+                    response = Response(status=307, location=f'/static/{static_path}')
         return response
 
     @XBlock.json_handler
@@ -266,17 +304,14 @@ class VideoStudentViewHandlers:
             mimetype (unicode): transcript content type
             add_attachment_header (bool): whether to add attachment header or not
         """
-        headerlist = [
-            ('Content-Language', language),
-        ]
-
+        # WebOb keeps and mutates the header list it is given, so this has to be a fresh list.
         if add_attachment_header:
-            headerlist.append(
-                (
-                    'Content-Disposition',
-                    f'attachment; filename="{filename}"'
-                )
-            )
+            headerlist = [
+                ('Content-Language', language),
+                ('Content-Disposition', f'attachment; filename="{filename}"'),
+            ]
+        else:
+            headerlist = [('Content-Language', language)]
 
         response = Response(
             content,
@@ -287,6 +322,35 @@ class VideoStudentViewHandlers:
 
         return response
 
+    def _available_translations_json(self, transcripts, is_bumper):
+        """
+        Return the verified available translations serialized as JSON bytes, or
+        empty bytes if there are none.
+
+        Verifying the translations queries the contentstore for every language, so
+        the result is cached, keyed on the fields it is computed from (including the video
+        ids that `en` transcripts are looked up by).
+        """
+        signature = repr((
+            str(self.location),
+            self.edx_video_id,
+            # `en` may also be verified against the transcripts of these video ids.
+            self.youtube_id_1_0,
+            get_html5_ids(self.html5_sources),
+            transcripts['sub'],
+            sorted(transcripts['transcripts'].items()),
+            bool(is_bumper),
+        ))
+        cache_key = 'video_block.available_translations.{}'.format(
+            hashlib.sha1(signature.encode('utf-8')).hexdigest()
+        )
+        available_translations = cache.get(cache_key)
+        if available_translations is None:
+            languages = self.available_translations(transcripts, verify_assets=True, is_bumper=is_bumper)
+            available_translations = json.dumps(languages).encode('utf-8') if languages else b''
+            cache.set(cache_key, available_translations, AVAILABLE_TRANSLATIONS_CACHE_TIMEOUT)
+        return available_translations
+
     @XBlock.handler
     def transcript(self, request, dispatch):
         """
@@ -326,7 +390,7 @@ class VideoStudentViewHandlers:
                 log.info("Invalid /translation request: no language.")
                 return Response(status=400)
 
-            if language not in ['en'] + list(transcripts["transcripts"].keys()):
+            if language != 'en' and language not in transcripts["transcripts"]:
                 log.info("Video: transcript facilities are not available for given language.")
                 return Response(status=404)
 
@@ -380,13 +444,9 @@ class VideoStudentViewHandlers:
                 mimetype
             )
         elif dispatch.startswith('available_translations'):
-            available_translations = self.available_translations(
-                transcripts,
-                verify_assets=True,
-                is_bumper=is_bumper
-            )
+            available_translations = self._available_translations_json(transcripts, is_bumper)
             if available_translations:
-                response = Response(json.dumps(available_translations))
+                response = Response(available_translations)
                 response.content_type = 'application/json'
             else:
                 response = Response(status=404)
@@ -436,6 +496,13 @@ class VideoStudioViewHandlers:
     """
     Handlers for Studio view.
     """
+    @cached_property
+    def _ugettext(self):
+        """
+        The `ugettext` of the block's i18n service, looked up once per block instance.
+        """
+        return self.runtime.service(self, "i18n").ugettext
+
     def validate_transcript_upload_data(self, data):
         """
         Validates video transcript file.
@@ -445,28 +512,27 @@ class VideoStudioViewHandlers:
             None or String
             If there is error returns error message otherwise None.
         """
-        error = None
-        _ = self.runtime.service(self, "i18n").ugettext
+        _ = self._ugettext
         # Validate the must have attributes - this error is unlikely to be faced by common users.
         must_have_attrs = ['edx_video_id', 'language_code', 'new_language_code']
         missing = [attr for attr in must_have_attrs if attr not in data]
-
-        # Get available transcript languages.
-        transcripts = self.get_transcripts_info()
-        available_translations = self.available_translations(transcripts, verify_assets=True)
-
         if missing:
-            error = _('The following parameters are required: {missing}.').format(missing=', '.join(missing))
-        elif (
-            data['language_code'] != data['new_language_code'] and data['new_language_code'] in available_translations
-        ):
-            error = _('A transcript with the "{language_code}" language code already exists.').format(
-                language_code=data['new_language_code'],
-            )
-        elif 'file' not in data:
-            error = _('A transcript file is required.')
+            return _('The following parameters are required: {missing}.').format(missing=', '.join(missing))
+
+        # Only a language change can clash with an existing transcript, so the available transcript
+        # languages (which requires checking the assets in the contentstore) are only fetched then.
+        new_language_code = data['new_language_code']
+        if data['language_code'] != new_language_code:
+            transcripts = self.get_transcripts_info()
+            if new_language_code in self.available_translations(transcripts, verify_assets=True):
+                return _('A transcript with the "{language_code}" language code already exists.').format(
+                    language_code=new_language_code,
+                )
+
+        if 'file' not in data:
+            return _('A transcript file is required.')
 
-        return error
+        return None
 
     @XBlock.handler
     def studio_transcript(self, request, dispatch):
@@ -519,11 +585,10 @@ class VideoStudioViewHandlers:
         """
         field = self.fields['transcripts']
         if self.transcripts:
-            transcripts_copy = self.transcripts.copy()
-            # Need to delete to overwrite, it's weird behavior,
-            # but it only works like this.
-            field.delete_from(self)
-            field.write_to(self, transcripts_copy)
+            # `transcripts` was mutated in place, so writing an equal copy back through
+            # the field is a no-op. Flag it as explicitly set instead, so the next save
+            # writes it without first deleting it from the field data.
+            self._dirty_fields[field] = EXPLICITLY_SET  # pylint: disable=protected-access
         else:
             field.delete_from(self)
 
@@ -531,7 +596,7 @@ class VideoStudioViewHandlers:
         """
         Upload transcript. Used in "POST" method in `studio_transcript`
         """
-        _ = self.runtime.service(self, "i18n").ugettext
+        _ = self._ugettext
         error = self.validate_transcript_upload_data(data=request.POST)
         if error:
             response = Response(json={'error': error}, status=400)
@@ -544,7 +609,7 @@ class VideoStudioViewHandlers:
             is_library = isinstance(self.usage_key.context_key, LibraryLocatorV2)
 
             if is_library:
-                filename = f'transcript-{new_language_code}.srt'
+                filename = f'static/transcript-{new_language_code}.srt'
             else:
                 if not edx_video_id:
                     # Back-populate the video ID for an external video.
@@ -552,56 +617,54 @@ class VideoStudioViewHandlers:
                     self.edx_video_id = edx_video_id = create_external_video(display_name='external video')
                 filename = f'{edx_video_id}-{new_language_code}.srt'
 
-            try:
+            payload = {
+                'edx_video_id': edx_video_id,
+                'language_code': new_language_code
+            }
+            if is_library:
+                # Save transcript as static asset in Learning Core if is a library component
+                lib_api.add_library_block_static_asset_file(
+                    self.usage_key,
+                    filename,
+                    transcript_file.read(),
+                )
+            else:
                 # Convert SRT transcript into an SJSON format
                 # and upload it to S3.
-                content = transcript_file.read()
-                payload = {
-                    'edx_video_id': edx_video_id,
-                    'language_code': new_language_code
-                }
-                if is_library:
-                    # Save transcript as static asset in Learning Core if is a library component
-                    filename = f"static/{filename}"
-                    lib_api.add_library_block_static_asset_file(
-                        self.usage_key,
-                        filename,
-                        content,
-                    )
-                else:
+                try:
                     sjson_subs = Transcript.convert(
-                        content=content.decode('utf-8'),
+                        content=transcript_file.read(),
                         input_format=Transcript.SRT,
                         output_format=Transcript.SJSON
                     ).encode()
-                    create_or_update_video_transcript(
-                        video_id=edx_video_id,
-                        language_code=language_code,
-                        metadata={
-                            'file_format': Transcript.SJSON,
-                            'language_code': new_language_code
+                except (TranscriptsGenerationException, UnicodeDecodeError):
+                    return Response(
+                        json={
+                            'error': _(
+                                'There is a problem with this transcript file. Try to upload a different file.'
+                            )
                         },
-                        file_data=ContentFile(sjson_subs),
+                        status=400
                     )
-
-                # If a new transcript is added, then both new_language_code and
-                # language_code fields will have the same value.
-                if language_code != new_language_code:
-                    self.transcripts.pop(language_code, None)
-                self.transcripts[new_language_code] = filename
-
-                if is_library:
-                    self._save_transcript_field()
-                response = Response(json.dumps(payload), status=201)
-            except (TranscriptsGenerationException, UnicodeDecodeError):
-                response = Response(
-                    json={
-                        'error': _(
-                            'There is a problem with this transcript file. Try to upload a different file.'
-                        )
+                create_or_update_video_transcript(
+                    video_id=edx_video_id,
+                    language_code=language_code,
+                    metadata={
+                        'file_format': Transcript.SJSON,
+                        'language_code': new_language_code
                     },
-                    status=400
+                    file_data=ContentFile(sjson_subs),
                 )
+
+            # If a new transcript is added, then both new_language_code and
+            # language_code fields will have the same value.
+            if language_code != new_language_code:
+                self.transcripts.pop(language_code, None)
+            self.transcripts[new_language_code] = filename
+
+            if is_library:
+                self._save_transcript_field()
+            response = Response(json.dumps(payload), status=201)
         return response
 
     def _studio_transcript_delete(self, request):
@@ -632,16 +695,15 @@ class VideoStudioViewHandlers:
                 self._save_transcript_field()
         else:
             if language == 'en':
-                # remove any transcript file from content store for the video ids
+                # remove any transcript file from content store for the video ids, and
+                # update metadata as `en` can also be present in `transcripts` field
                 possible_sub_ids = [
                     self.sub,  # pylint: disable=access-member-before-definition
-                    self.youtube_id_1_0
-                ] + get_html5_ids(self.html5_sources)
-                for sub_id in possible_sub_ids:
-                    remove_subs_from_store(sub_id, self, language)
-
-                # update metadata as `en` can also be present in `transcripts` field
-                remove_subs_from_store(self.transcripts.pop(language, None), self, language)
+                    self.youtube_id_1_0,
+                    *get_html5_ids(self.html5_sources),
+                    self.transcripts.pop(language, None),
+                ]
+                remove_unique_subs_from_store(possible_sub_ids, self, language)
 
                 # also empty `sub` field
                 self.sub = ''  # pylint: disable=attribute-defined-outside-init
@@ -654,7 +716,7 @@ class VideoStudioViewHandlers:
         """
         Get transcript. Used in "GET" method in `studio_transcript`
         """
-        _ = self.runtime.service(self, "i18n").ugettext
+        _ = self._ugettext
         language = request.GET.get('language_code')
         if not language:
             return Response(json={'error': _('Language is required.')}, status=400)